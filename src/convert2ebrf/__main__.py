@@ -9,14 +9,14 @@ import logging
 import sys
 from collections.abc import Sequence
 
-from PySide6.QtWidgets import QApplication
-# noinspection PyUnresolvedReferences
-from __feature__ import snake_case, true_property
-
-from convert2ebrf.brf_to_ebrf import Brf2EbrfDialog
-
 
 def run_app(args: Sequence[str]):
+    # Spawned conversion workers re-import the main module, so it must not pull in the GUI at import time.
+    from PySide6.QtWidgets import QApplication
+    # noinspection PyUnresolvedReferences
+    from __feature__ import snake_case, true_property
+    from convert2ebrf.brf_to_ebrf import Brf2EbrfDialog
+
     logging.basicConfig(
         level=logging.INFO, format="%(levelname)s:%(asctime)s:%(module)s:%(message)s"
     )
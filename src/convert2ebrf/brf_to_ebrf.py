@@ -5,53 +5,162 @@
 # Convert2EBRF is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
 # You should have received a copy of the GNU General Public License along with Convert2EBRF. If not, see <https://www.gnu.org/licenses/>.
 
+import errno
+import functools
+import multiprocessing
 import os
-import shutil
-from collections.abc import Iterable
+import zipfile
+from collections.abc import Callable, Iterable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from typing import BinaryIO
 
-from PySide6.QtCore import QObject, Slot, Signal, QThreadPool, QSettings
+from PySide6.QtCore import QObject, Slot, Signal, QThread, QSettings, Qt, QCoreApplication, QTimer
 from PySide6.QtWidgets import QWidget, QFormLayout, QCheckBox, QDialog, QDialogButtonBox, QVBoxLayout, \
-    QProgressDialog, QMessageBox, QTabWidget, QSpinBox, QFileDialog, QComboBox
+    QProgressDialog, QMessageBox, QTabWidget, QSpinBox, QFileDialog, QComboBox, QAbstractButton
 # noinspection PyUnresolvedReferences
 from __feature__ import snake_case, true_property
 from brf2ebrf.common import PageLayout, PageNumberPosition
-from brf2ebrf.parser import ParsingCancelledException
-from brf2ebrf.scripts.brf2ebrf import create_brf2ebrf_parser, convert_brf2ebrf
 
-from convert2ebrf.utils import RunnableAdapter
+from convert2ebrf.utils import lazy_import
 from convert2ebrf.widgets import FilePickerWidget
 
+_brf_parser = lazy_import("brf2ebrf.parser")
+_workers = lazy_import("convert2ebrf.workers")
+
+# Use spawn rather than fork. Forking a process that is running Qt threads is not safe.
+_MP_CONTEXT = multiprocessing.get_context("spawn")
+_WINDOWS_MAX_PROCESS_WORKERS = 61
+
 _LAST_DIR_SETTING_KEY = "Conversion/last_dir"
+_BRF_FILE_FILTER = "Braille Ready Files (*.brf)"
+_EBRF_FILE_FILTER = "eBraille Files (*.zip)"
+_EBRF_SAVE_OPTIONS = QFileDialog.Option.DontConfirmOverwrite
+
+_PROGRESS_STEPS = 1000
+
+_RAM_TEMP_DIR = "/dev/shm"
+_DEFAULT_COMPRESSION_LEVEL = 1
+_COMPRESSED_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+
+
+@functools.lru_cache(maxsize=1)
+def _default_page_layout() -> PageLayout:
+    return PageLayout(
+        odd_braille_page_number=PageNumberPosition.BOTTOM_RIGHT,
+        odd_print_page_number=PageNumberPosition.TOP_RIGHT,
+        cells_per_line=40,
+        lines_per_page=25
+    )
+
+
+@functools.lru_cache(maxsize=16)
+def _page_layout(odd_braille_page_number: PageNumberPosition, even_braille_page_number: PageNumberPosition,
+                 odd_print_page_number: PageNumberPosition, even_print_page_number: PageNumberPosition,
+                 cells_per_line: int, lines_per_page: int) -> PageLayout:
+    return PageLayout(
+        odd_braille_page_number=odd_braille_page_number,
+        even_braille_page_number=even_braille_page_number,
+        odd_print_page_number=odd_print_page_number,
+        even_print_page_number=even_print_page_number,
+        cells_per_line=cells_per_line,
+        lines_per_page=lines_per_page
+    )
+
+
+def _temp_dir_root() -> str | None:
+    return _RAM_TEMP_DIR if os.path.isdir(_RAM_TEMP_DIR) and os.access(_RAM_TEMP_DIR, os.W_OK) else None
+
+
+def _scan_brf_directory(directory: str) -> tuple[str, ...]:
+    return tuple(sorted(e.path for e in os.scandir(directory) if e.is_file() and e.name.lower().endswith(".brf")))
+
+
+def _open_archive(out_file: BinaryIO, compression_level: int = _DEFAULT_COMPRESSION_LEVEL) -> zipfile.ZipFile:
+    if not compression_level:
+        return zipfile.ZipFile(out_file, "w", compression=zipfile.ZIP_STORED)
+    return zipfile.ZipFile(out_file, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=compression_level)
+
+
+def _archive_file(zip_file: zipfile.ZipFile, path: str, arcname: str):
+    compress_type = zipfile.ZIP_STORED if arcname.lower().endswith(_COMPRESSED_SUFFIXES) else None
+    zip_file.write(path, arcname, compress_type=compress_type)
+
+
+def _archive_volume(zip_file: zipfile.ZipFile, path: str):
+    _archive_file(zip_file, path, os.path.basename(path))
+    os.remove(path)
 
-_DEFAULT_PAGE_LAYOUT = PageLayout(
-    odd_braille_page_number=PageNumberPosition.BOTTOM_RIGHT,
-    odd_print_page_number=PageNumberPosition.TOP_RIGHT,
-    cells_per_line=40,
-    lines_per_page=25
-)
+
+def _archive_directory(zip_file: zipfile.ZipFile, source_dir: str):
+    # Directory entries are implied by the file paths, so empty directories are left out.
+    for dir_path, dir_names, file_names in os.walk(source_dir):
+        dir_names[:] = sorted(d for d in dir_names if not d.startswith("."))
+        for name in sorted(file_names):
+            if not name.startswith("."):
+                path = os.path.join(dir_path, name)
+                _archive_file(zip_file, path, os.path.relpath(path, source_dir))
+
+
+class _StagingSpaceError(OSError):
+    pass
 
 
 class ConvertTask(QObject):
     started = Signal()
-    progress = Signal(int, float)
+    progress = Signal(int)
     finished = Signal()
     cancelled = Signal()
     errorRaised = Signal(Exception)
+    inputMissing = Signal()
 
     def __init__(self, parent: QObject = None):
         super().__init__(parent=parent)
+        self._input_brf_list: Iterable[str] | Callable[[], Iterable[str]] = ()
+        self._output_ebrf = ""
+        self._input_images: str | None = None
+        self._detect_running_heads = True
+        self._page_layout: PageLayout | None = None
+        self._compression_level = _DEFAULT_COMPRESSION_LEVEL
+        self._cancel = _MP_CONTEXT.Event()
         self._cancel_requested = False
+        self._last_bucket = -1
+
+    def configure(self, input_brf_list: Iterable[str] | Callable[[], Iterable[str]], output_ebrf: str,
+                  input_images: str | None, detect_running_heads: bool = True,
+                  page_layout: PageLayout | None = None, compression_level: int = _DEFAULT_COMPRESSION_LEVEL):
+        self._input_brf_list = input_brf_list
+        self._output_ebrf = output_ebrf
+        self._input_images = input_images
+        self._detect_running_heads = detect_running_heads
+        self._page_layout = page_layout
+        self._compression_level = compression_level
+        self.reset()
+
+    def reset(self):
+        self._cancel_requested = False
+        self._cancel.clear()
+        self._last_bucket = -1
 
-    def __call__(self, input_brf_list: Iterable[str], output_ebrf: str, input_images: str | None,
-                 detect_running_heads: bool = True,
-                 page_layout: PageLayout = _DEFAULT_PAGE_LAYOUT):
+    @Slot()
+    def run(self):
+        output_ebrf = self._output_ebrf
         self.started.emit()
         try:
-            self._convert(input_brf_list, input_images, output_ebrf, detect_running_heads, page_layout)
+            brf_source = self._input_brf_list
+            input_brf_list = tuple(brf_source() if callable(brf_source) else brf_source)
+        except OSError as e:
+            self.errorRaised.emit(e)
+            return
+        if not input_brf_list:
+            self.inputMissing.emit()
+            return
+        try:
+            self._convert(input_brf_list, self._input_images, output_ebrf, self._detect_running_heads,
+                          self._page_layout or _default_page_layout(), self._compression_level)
             self.finished.emit()
-        except ParsingCancelledException:
+        except _brf_parser.ParsingCancelledException:
             Path(output_ebrf).unlink(missing_ok=True)
             self.cancelled.emit()
         except Exception as e:
@@ -59,39 +168,123 @@ class ConvertTask(QObject):
             self.errorRaised.emit(e)
 
     def _convert(self, input_brf_list: Iterable[str], input_images: str, output_ebrf: str, detect_running_heads: bool,
-                 page_layout: PageLayout):
-        with open(output_ebrf, "wb") as out_file:
-            with TemporaryDirectory() as temp_dir:
-                os.makedirs(os.path.join(temp_dir, "images"), exist_ok=True)
-                for index, brf in enumerate(input_brf_list):
-                    temp_file = os.path.join(temp_dir, f"vol{index}.html")
-                    parser = create_brf2ebrf_parser(
-                        page_layout=page_layout,
-                        detect_running_heads=detect_running_heads,
-                        brf_path=brf,
-                        output_path=temp_file,
-                        images_path=input_images
-                    )
-                    parser_steps = len(parser)
-                    convert_brf2ebrf(brf, temp_file, parser,
-                                     progress_callback=lambda x: self.progress.emit(index, x / parser_steps),
-                                     is_cancelled=lambda: self._cancel_requested)
-                with TemporaryDirectory() as out_temp_dir:
-                    temp_ebrf = shutil.make_archive(os.path.join(out_temp_dir, "output_ebrf"), "zip", temp_dir)
-                    with open(temp_ebrf, "rb") as temp_ebrf_file:
-                        shutil.copyfileobj(temp_ebrf_file, out_file)
+                 page_layout: PageLayout, compression_level: int = _DEFAULT_COMPRESSION_LEVEL):
+        input_brf_list = tuple(input_brf_list)
+        temp_root = _temp_dir_root()
+        try:
+            self._write_ebrf(input_brf_list, input_images, output_ebrf, detect_running_heads, page_layout,
+                             compression_level, temp_root)
+        except _StagingSpaceError:
+            if temp_root is None:
+                raise
+            self._cancel.clear()
+            if self._cancel_requested:
+                self._cancel.set()
+            self._last_bucket = -1
+            self._emit_progress(0)
+            self._write_ebrf(input_brf_list, input_images, output_ebrf, detect_running_heads, page_layout,
+                             compression_level, None)
+
+    def _write_ebrf(self, input_brf_list: tuple[str, ...], input_images: str | None, output_ebrf: str,
+                    detect_running_heads: bool, page_layout: PageLayout, compression_level: int,
+                    temp_root: str | None):
+        with open(output_ebrf, "wb") as out_file, _open_archive(out_file, compression_level) as zip_file:
+            with TemporaryDirectory(dir=temp_root) as temp_dir:
+                if input_images:
+                    os.makedirs(os.path.join(temp_dir, "images"), exist_ok=True)
+                self._convert_volumes(input_brf_list, temp_dir, input_images, detect_running_heads, page_layout,
+                                      zip_file)
+                _archive_directory(zip_file, temp_dir)
+        self._emit_progress(_PROGRESS_STEPS)
+
+    def _convert_volumes(self, input_brf_list: tuple[str, ...], temp_dir: str, input_images: str | None,
+                         detect_running_heads: bool, page_layout: PageLayout, zip_file: zipfile.ZipFile):
+        volume_count = max(len(input_brf_list), 1)
+        volume_steps = max(_PROGRESS_STEPS // volume_count, 1)
+        volume_progress = [0] * volume_count
+        total_progress = 0
+        progress_queue = _MP_CONTEXT.SimpleQueue()
+        vol_prefix = f"{temp_dir}{os.sep}vol"
+        volume_done = [False] * volume_count
+        next_volume = 0
+        archived = []
+        with ThreadPoolExecutor(1) as archiver, self._create_executor(
+                min(volume_count, os.cpu_count() or 1, _WINDOWS_MAX_PROCESS_WORKERS), progress_queue) as executor:
+            volume_indexes = {
+                executor.submit(_workers.convert_volume, index, brf, f"{vol_prefix}{index}.html", input_images,
+                                detect_running_heads, page_layout, volume_steps): index
+                for index, brf in enumerate(input_brf_list)
+            }
+            pending = volume_indexes.keys()
+            try:
+                while pending:
+                    done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            future.result()
+                        except OSError as e:
+                            if e.errno == errno.ENOSPC:
+                                raise _StagingSpaceError(e.errno, e.strerror, e.filename) from e
+                            raise
+                        volume_done[volume_indexes[future]] = True
+                    while not progress_queue.empty():
+                        index, bucket = progress_queue.get()
+                        total_progress += bucket - volume_progress[index]
+                        volume_progress[index] = bucket
+                    self._emit_progress(
+                        min(total_progress * _PROGRESS_STEPS // (volume_steps * volume_count), _PROGRESS_STEPS - 1))
+                    while next_volume < volume_count and volume_done[next_volume]:
+                        archived.append(archiver.submit(_archive_volume, zip_file, f"{vol_prefix}{next_volume}.html"))
+                        next_volume += 1
+                for future in archived:
+                    future.result()
+            except BaseException:
+                self._cancel.set()
+                executor.shutdown(wait=False, cancel_futures=True)
+                archiver.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    def _create_executor(self, max_workers: int, progress_queue) -> Executor:
+        initargs = (progress_queue, self._cancel)
+        if max_workers > 1:
+            return ProcessPoolExecutor(max_workers, mp_context=_MP_CONTEXT, initializer=_workers.init_worker,
+                                       initargs=initargs)
+        return ThreadPoolExecutor(1, initializer=_workers.init_worker, initargs=initargs)
+
+    def _emit_progress(self, bucket: int):
+        if bucket != self._last_bucket:
+            self._last_bucket = bucket
+            self.progress.emit(bucket)
 
+    @Slot()
     def cancel(self):
         self._cancel_requested = True
+        self._cancel.set()
+
+
+class _WidgetAttr:
+    def __init__(self, widget_name: str, attr: str):
+        self._widget_name = widget_name
+        self._attr = attr
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return getattr(getattr(obj, self._widget_name), self._attr)
+
+    def __set__(self, obj, value):
+        setattr(getattr(obj, self._widget_name), self._attr, value)
 
 
 class ConversionGeneralSettingsWidget(QWidget):
     inputBrfChanged = Signal(str)
     imagesDirectoryChanged = Signal(str)
     outputEbrfChanged = Signal(str)
+    compressionLevelChanged = Signal(int)
 
     def __init__(self, parent: QObject = None):
         super().__init__(parent)
+        self._settings = QSettings(self)
         layout = QFormLayout(self)
         self._input_type_combo = QComboBox()
         self._input_type_combo.editable = False
@@ -103,11 +296,10 @@ class ConversionGeneralSettingsWidget(QWidget):
         layout.add_row("Include images", self._include_images_checkbox)
 
         def get_images_dir_from_user(x):
-            settings = QSettings()
-            default_dir = settings.value(_LAST_DIR_SETTING_KEY, str(Path.home()))
+            default_dir = self._settings.value(_LAST_DIR_SETTING_KEY, str(Path.home()))
             image_dir = QFileDialog.get_existing_directory(parent=x, dir=default_dir)
             if image_dir:
-                settings.set_value(_LAST_DIR_SETTING_KEY, image_dir)
+                self._remember_last_dir(image_dir)
                 return image_dir
 
         self._image_dir_edit = FilePickerWidget(
@@ -115,47 +307,56 @@ class ConversionGeneralSettingsWidget(QWidget):
         layout.add_row("Image directory", self._image_dir_edit)
 
         def get_output_ebrf_file_from_user(x):
-            settings = QSettings()
-            default_dir = settings.value(_LAST_DIR_SETTING_KEY, str(Path.home()))
+            default_dir = self._settings.value(_LAST_DIR_SETTING_KEY, str(Path.home()))
             save_path = QFileDialog.get_save_file_name(
-                parent=x, dir=default_dir, filter="eBraille Files (*.zip)",
-                options=QFileDialog.Option.DontConfirmOverwrite
+                parent=x, dir=default_dir, filter=_EBRF_FILE_FILTER,
+                options=_EBRF_SAVE_OPTIONS
             )[0]
             if save_path:
-                settings.set_value(_LAST_DIR_SETTING_KEY, os.path.dirname(save_path))
+                self._remember_last_dir(os.path.dirname(save_path))
                 return save_path
 
         self._output_ebrf_edit = FilePickerWidget(get_output_ebrf_file_from_user)
         layout.add_row("Output EBRF", self._output_ebrf_edit)
+        self._compression_level_spinbox = QSpinBox()
+        self._compression_level_spinbox.set_range(0, 9)
+        self._compression_level_spinbox.single_step = 1
+        self._compression_level_spinbox.value = _DEFAULT_COMPRESSION_LEVEL
+        layout.add_row("Compression level", self._compression_level_spinbox)
         self._update_include_images_state(self._include_images_checkbox.checked)
         self._include_images_checkbox.toggled.connect(self._update_include_images_state)
         self._input_type_combo.currentIndexChanged.connect(self._clear_input_brf)
         self._input_brf_edit.fileChanged.connect(self.inputBrfChanged.emit)
         self._image_dir_edit.fileChanged.connect(self.imagesDirectoryChanged.emit)
         self._output_ebrf_edit.fileChanged.connect(self.outputEbrfChanged.emit)
+        self._compression_level_spinbox.valueChanged.connect(self.compressionLevelChanged.emit)
 
     @Slot(bool)
     def _update_include_images_state(self, checked: bool):
         self._image_dir_edit.enabled = checked
         if not checked:
             self._image_dir_edit.file_name = ""
+        self.imagesDirectoryChanged.emit(self._image_dir_edit.file_name)
+
+    def _remember_last_dir(self, directory: str):
+        if self._settings.value(_LAST_DIR_SETTING_KEY) != directory:
+            self._settings.set_value(_LAST_DIR_SETTING_KEY, directory)
 
     def _get_input_brf_from_user(self, x):
-        settings = QSettings()
-        default_dir = settings.value(_LAST_DIR_SETTING_KEY, str(Path.home()))
+        default_dir = self._settings.value(_LAST_DIR_SETTING_KEY, str(Path.home()))
         if self._input_type_combo.current_index:
             input_dir = QFileDialog.get_existing_directory(
                 parent=x, dir=default_dir
             )
             if input_dir:
-                settings.set_value(_LAST_DIR_SETTING_KEY, input_dir)
+                self._remember_last_dir(input_dir)
                 return input_dir
         else:
             input_files = QFileDialog.get_open_file_names(
-                parent=x, dir=default_dir, filter="Braille Ready Files (*.brf)"
+                parent=x, dir=default_dir, filter=_BRF_FILE_FILTER
             )[0]
             if input_files:
-                settings.set_value(_LAST_DIR_SETTING_KEY, os.path.dirname(input_files[0]))
+                self._remember_last_dir(os.path.dirname(input_files[0]))
                 return os.path.pathsep.join(input_files)
 
     @property
@@ -167,6 +368,7 @@ class ConversionGeneralSettingsWidget(QWidget):
         self._input_type_combo.current_index = 1 if os.path.isdir(value) else 0
         self._input_brf_edit.file_name = value
 
+    @Slot()
     def _clear_input_brf(self):
         self._input_brf_edit.file_name = ""
 
@@ -182,13 +384,8 @@ class ConversionGeneralSettingsWidget(QWidget):
             self._include_images_checkbox.checked = True
             self._image_dir_edit.file_name = value
 
-    @property
-    def output_ebrf(self) -> str:
-        return self._output_ebrf_edit.file_name
-
-    @output_ebrf.setter
-    def output_ebrf(self, value: str):
-        self._output_ebrf_edit.text = value
+    output_ebrf = _WidgetAttr("_output_ebrf_edit", "file_name")
+    compression_level = _WidgetAttr("_compression_level_spinbox", "value")
 
 
 _PAGE_NUMBER_POSITIONS_DICT = {
@@ -198,6 +395,8 @@ _PAGE_NUMBER_POSITIONS_DICT = {
     PageNumberPosition.BOTTOM_LEFT: "Bottom left",
     PageNumberPosition.BOTTOM_RIGHT: "Bottom right"
 }
+_PAGE_NUMBER_POSITIONS = tuple(_PAGE_NUMBER_POSITIONS_DICT)
+_PAGE_NUMBER_POSITION_INDEXES = {p: i for i, p in enumerate(_PAGE_NUMBER_POSITIONS)}
 
 
 class ConversionPageSettingsWidget(QWidget):
@@ -233,7 +432,7 @@ class ConversionPageSettingsWidget(QWidget):
             combo.editable = False
             for p, t in _PAGE_NUMBER_POSITIONS_DICT.items():
                 combo.add_item(t, p)
-            combo.current_text = _PAGE_NUMBER_POSITIONS_DICT[default_selection]
+            combo.current_index = _PAGE_NUMBER_POSITION_INDEXES[default_selection]
             return combo
 
         self._odd_bpn_position = create_page_number_position_combo(PageNumberPosition.BOTTOM_RIGHT)
@@ -244,25 +443,32 @@ class ConversionPageSettingsWidget(QWidget):
         layout.add_row("Odd print page number", self._odd_ppn_position)
         self._even_ppn_position = create_page_number_position_combo()
         layout.add_row("Even print page number", self._even_ppn_position)
+        self._odd_bpn = self._odd_bpn_position.current_data()
+        self._even_bpn = self._even_bpn_position.current_data()
+        self._odd_ppn = self._odd_ppn_position.current_data()
+        self._even_ppn = self._even_ppn_position.current_data()
         self._update_validity()
         self._detect_running_heads_checkbox.toggled.connect(self.detectRunningHeadsChanged.emit)
         self._cells_per_line_spinbox.valueChanged.connect(self.cellsPerLineChanged.emit)
         self._lines_per_page_spinbox.valueChanged.connect(self.linesPerPageChanged.emit)
-        def form_update(change_signal: Signal, value: PageNumberPosition):
-            change_signal.emit(value)
-            self._update_validity()
         self._odd_bpn_position.currentIndexChanged.connect(
-            lambda x: form_update(self.oddBraillePageNumberChanged, self._odd_bpn_position.item_data(x)))
+            functools.partial(self._position_changed, "_odd_bpn", self.oddBraillePageNumberChanged))
         self._even_bpn_position.currentIndexChanged.connect(
-            lambda x: form_update(self.evenBraillePageNumberChanged, self._even_bpn_position.item_data(x)))
+            functools.partial(self._position_changed, "_even_bpn", self.evenBraillePageNumberChanged))
         self._odd_ppn_position.currentIndexChanged.connect(
-            lambda x: form_update(self.oddPrintPageNumberChanged, self._odd_ppn_position.item_data(x)))
+            functools.partial(self._position_changed, "_odd_ppn", self.oddPrintPageNumberChanged))
         self._even_ppn_position.currentIndexChanged.connect(
-            lambda x: form_update(self.evenPrintPageNumberChanged, self._even_ppn_position.item_data(x)))
+            functools.partial(self._position_changed, "_even_ppn", self.evenPrintPageNumberChanged))
+
+    def _position_changed(self, attr_name: str, change_signal: Signal, index: int):
+        value = _PAGE_NUMBER_POSITIONS[index]
+        setattr(self, attr_name, value)
+        change_signal.emit(value)
+        self._update_validity()
 
     def _update_validity(self):
         old_validity = self._is_valid
-        new_validity = (self.odd_braille_page_number_position == PageNumberPosition.NONE or self.odd_braille_page_number_position != self.odd_print_page_number_position) and (self.even_braille_page_number_position == PageNumberPosition.NONE or self.even_braille_page_number_position != self.even_print_page_number_position)
+        new_validity = (self._odd_bpn == PageNumberPosition.NONE or self._odd_bpn != self._odd_ppn) and (self._even_bpn == PageNumberPosition.NONE or self._even_bpn != self._even_ppn)
         if old_validity != new_validity:
             self._is_valid = new_validity
             self.isValidChanged.emit(new_validity)
@@ -271,64 +477,46 @@ class ConversionPageSettingsWidget(QWidget):
     def is_valid(self) -> bool:
         return self._is_valid
 
-    @property
-    def detect_running_heads(self) -> bool:
-        return self._detect_running_heads_checkbox.checked
-
-    @detect_running_heads.setter
-    def detect_running_heads(self, value: bool):
-        self._detect_running_heads_checkbox.checked = value
-
-    @property
-    def cells_per_line(self) -> int:
-        return self._cells_per_line_spinbox.value
-
-    @cells_per_line.setter
-    def cells_per_line(self, value: int):
-        self._cells_per_line_spinbox.value = value
-
-    @property
-    def lines_per_page(self) -> int:
-        return self._lines_per_page_spinbox.value
-
-    @lines_per_page.setter
-    def lines_per_page(self, value: int):
-        self._lines_per_page_spinbox.value = value
+    detect_running_heads = _WidgetAttr("_detect_running_heads_checkbox", "checked")
+    cells_per_line = _WidgetAttr("_cells_per_line_spinbox", "value")
+    lines_per_page = _WidgetAttr("_lines_per_page_spinbox", "value")
 
     @property
     def odd_braille_page_number_position(self) -> PageNumberPosition:
-        return self._odd_bpn_position.current_data()
+        return self._odd_bpn
 
     @odd_braille_page_number_position.setter
     def odd_braille_page_number_position(self, value: PageNumberPosition):
-        self._odd_bpn_position.current_text = _PAGE_NUMBER_POSITIONS_DICT[value]
+        self._odd_bpn_position.current_index = _PAGE_NUMBER_POSITION_INDEXES[value]
 
     @property
     def even_braille_page_number_position(self) -> PageNumberPosition:
-        return self._even_bpn_position.current_data()
+        return self._even_bpn
 
     @even_braille_page_number_position.setter
     def even_braille_page_number_position(self, value: PageNumberPosition):
-        self._even_bpn_position.current_text = _PAGE_NUMBER_POSITIONS_DICT[value]
+        self._even_bpn_position.current_index = _PAGE_NUMBER_POSITION_INDEXES[value]
 
     @property
     def odd_print_page_number_position(self) -> PageNumberPosition:
-        return self._odd_ppn_position.current_data()
+        return self._odd_ppn
 
     @odd_print_page_number_position.setter
     def odd_print_page_number_position(self, value: PageNumberPosition):
-        self._odd_ppn_position.current_text = _PAGE_NUMBER_POSITIONS_DICT[value]
+        self._odd_ppn_position.current_index = _PAGE_NUMBER_POSITION_INDEXES[value]
 
     @property
     def even_print_page_number_position(self) -> PageNumberPosition:
-        return self._even_ppn_position.current_data()
+        return self._even_ppn
 
     @even_print_page_number_position.setter
     def even_print_page_number_position(self, value: PageNumberPosition):
-        self._even_ppn_position.current_text = _PAGE_NUMBER_POSITIONS_DICT[value]
+        self._even_ppn_position.current_index = _PAGE_NUMBER_POSITION_INDEXES[value]
 
 
 class Brf2EbrfDialog(QDialog):
+    conversionRequested = Signal()
+
     def __init__(self, parent: QObject = None):
         super().__init__(parent)
         self.window_title = "Convert BRF to EBRF"
@@ -346,68 +534,133 @@ class Brf2EbrfDialog(QDialog):
         self._convert_button = self.button_box.add_button("Convert", QDialogButtonBox.ButtonRole.ApplyRole)
         self._convert_button.default = True
         layout.add_widget(self.button_box)
+        self._done_box = QMessageBox(QMessageBox.Icon.Information, "Conversion complete", "",
+                                     QMessageBox.StandardButton.Ok, self)
+        self._error_box = QMessageBox(QMessageBox.Icon.Critical, "Error encountered", "",
+                                      QMessageBox.StandardButton.Ok, self)
+        self._warning_box = QMessageBox(QMessageBox.Icon.Warning, "No BRF files", "",
+                                        QMessageBox.StandardButton.Ok, self)
+        self._overwrite_box = QMessageBox(QMessageBox.Icon.Question, "Overwrite existing file?", "",
+                                          QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, self)
+        self._overwrite_box.buttonClicked.connect(self._on_overwrite_answered)
+        self._progress_dialog: QProgressDialog | None = None
+        self._output_ebrf = ""
+        self._input_brf = ""
+        self._converting = False
+        self._task = ConvertTask()
+        self._worker_thread = QThread(self)
+        self._task.move_to_thread(self._worker_thread)
+        self._worker_thread.finished.connect(self._task.delete_later)
+        self.conversionRequested.connect(self._task.run)
+        QCoreApplication.instance().aboutToQuit.connect(self._stop_worker_thread)
+        self._worker_thread.start()
         self._update_validity()
+        self._task.started.connect(self._on_conversion_started, Qt.ConnectionType.QueuedConnection)
+        self._task.progress.connect(self._on_conversion_progress, Qt.ConnectionType.QueuedConnection)
+        self._task.finished.connect(self._on_conversion_finished, Qt.ConnectionType.QueuedConnection)
+        self._task.cancelled.connect(self._on_conversion_cancelled, Qt.ConnectionType.QueuedConnection)
+        self._task.errorRaised.connect(self._on_conversion_error, Qt.ConnectionType.QueuedConnection)
+        self._task.inputMissing.connect(self._on_conversion_input_missing, Qt.ConnectionType.QueuedConnection)
         self.button_box.rejected.connect(self.reject)
         self._convert_button.clicked.connect(self.on_apply)
-        self._brf2ebrf_form.inputBrfChanged.connect(lambda x: self._update_validity())
-        self._brf2ebrf_form.imagesDirectoryChanged.connect(lambda x: self._update_validity())
-        self._brf2ebrf_form.outputEbrfChanged.connect(lambda x: self._update_validity())
-        self._page_settings_form.isValidChanged.connect(lambda x: self._update_validity())
+        self._validity_timer = QTimer(self)
+        self._validity_timer.single_shot = True
+        self._validity_timer.interval = 0
+        self._validity_timer.timeout.connect(self._update_validity)
+        self._brf2ebrf_form.inputBrfChanged.connect(self._schedule_validity_update)
+        self._brf2ebrf_form.imagesDirectoryChanged.connect(self._schedule_validity_update)
+        self._brf2ebrf_form.outputEbrfChanged.connect(self._schedule_validity_update)
+        self._page_settings_form.isValidChanged.connect(self._schedule_validity_update)
+
+    @Slot()
+    def _schedule_validity_update(self):
+        self._validity_timer.start()
 
     @Slot()
     def _update_validity(self):
         general_settings = self._brf2ebrf_form
-        is_valid = self._page_settings_form.is_valid and "" not in [general_settings.input_brf, general_settings.image_directory,
-                              general_settings.output_ebrf]
-        self._convert_button.enabled = is_valid
+        self._convert_button.enabled = bool(
+            not self._converting and self._page_settings_form.is_valid and general_settings.input_brf
+            and general_settings.output_ebrf and general_settings.image_directory != "")
 
     @Slot()
     def on_apply(self):
-        number_of_steps = 1000
+        output_ebrf = self._brf2ebrf_form.output_ebrf
+        if os.path.exists(output_ebrf):
+            self._overwrite_box.text = f"The output file {output_ebrf} already exists, do you want to overwrite it?"
+            self._overwrite_box.open()
+        else:
+            self._start_conversion()
+
+    @Slot(QAbstractButton)
+    def _on_overwrite_answered(self, button: QAbstractButton):
+        if self._overwrite_box.standard_button(button) == QMessageBox.StandardButton.Yes:
+            self._start_conversion()
+
+    def _start_conversion(self):
         input_brf_str = self._brf2ebrf_form.input_brf
-        brf_list = [os.path.join(input_brf_str, f) for f in os.listdir(
-            input_brf_str
-        )] if os.path.isdir(input_brf_str) else input_brf_str.split(
-            os.path.pathsep
+        brf_list = functools.partial(_scan_brf_directory, input_brf_str) if os.path.isdir(input_brf_str) else tuple(
+            input_brf_str.split(os.path.pathsep)
         )
-        num_of_inputs = len(brf_list)
         output_ebrf = self._brf2ebrf_form.output_ebrf
-        if os.path.exists(output_ebrf):
-            overwrite_result = QMessageBox.question(
-                self, "Overwrite existing file?",
-                f"The output file {output_ebrf} already exists, do you want to overwrite it?"
-            )
-            if overwrite_result == QMessageBox.StandardButton.No:
-                return
-        page_layout = PageLayout(
-            odd_braille_page_number=self._page_settings_form.odd_braille_page_number_position,
-            even_braille_page_number=self._page_settings_form.even_braille_page_number_position,
-            odd_print_page_number=self._page_settings_form.odd_print_page_number_position,
-            even_print_page_number=self._page_settings_form.even_print_page_number_position,
-            cells_per_line=self._page_settings_form.cells_per_line,
-            lines_per_page=self._page_settings_form.lines_per_page
+        page_layout = _page_layout(
+            self._page_settings_form.odd_braille_page_number_position,
+            self._page_settings_form.even_braille_page_number_position,
+            self._page_settings_form.odd_print_page_number_position,
+            self._page_settings_form.even_print_page_number_position,
+            self._page_settings_form.cells_per_line,
+            self._page_settings_form.lines_per_page
         )
-        pd = QProgressDialog("Conversion in progress", "Cancel", 0, number_of_steps)
-
-        def update_progress(value: float):
-            pd.value = int(value * number_of_steps)
-
-        def finished_converting():
-            update_progress(1)
-            QMessageBox.information(None, "Conversion complete",
-                                    f"Your file has been converted and {output_ebrf} has been created.")
-
-        def error_raised(error: Exception):
-            pd.cancel()
-            QMessageBox.critical(None, "Error encountered", f"Encountered an error\n{error}")
-
-        t = ConvertTask(self)
-        pd.canceled.connect(t.cancel)
-        t.started.connect(lambda: update_progress(0))
-        t.progress.connect(lambda i, p: update_progress((i + p) / num_of_inputs))
-        t.finished.connect(finished_converting)
-        t.errorRaised.connect(error_raised)
-        QThreadPool.global_instance().start(
-            RunnableAdapter(t, brf_list, output_ebrf, self._brf2ebrf_form.image_directory,
-                            detect_running_heads=self._page_settings_form.detect_running_heads,
-                            page_layout=page_layout))
+        self._output_ebrf = output_ebrf
+        self._input_brf = input_brf_str
+        self._progress_dialog = QProgressDialog("Conversion in progress", "Cancel", 0, _PROGRESS_STEPS)
+        self._progress_dialog.canceled.connect(self._task.cancel, Qt.ConnectionType.DirectConnection)
+        self._converting = True
+        self._update_validity()
+        self._task.configure(brf_list, output_ebrf, self._brf2ebrf_form.image_directory,
+                             detect_running_heads=self._page_settings_form.detect_running_heads,
+                             page_layout=page_layout, compression_level=self._brf2ebrf_form.compression_level)
+        self.conversionRequested.emit()
+
+    @Slot()
+    def _stop_worker_thread(self):
+        self._task.cancel()
+        self._worker_thread.quit()
+        self._worker_thread.wait()
+
+    def _conversion_ended(self):
+        self._converting = False
+        self._update_validity()
+
+    @Slot()
+    def _on_conversion_started(self):
+        self._progress_dialog.value = 0
+
+    @Slot(int)
+    def _on_conversion_progress(self, value: int):
+        self._progress_dialog.value = value
+
+    @Slot()
+    def _on_conversion_finished(self):
+        self._conversion_ended()
+        self._progress_dialog.value = _PROGRESS_STEPS
+        self._done_box.text = f"Your file has been converted and {self._output_ebrf} has been created."
+        self._done_box.exec()
+
+    @Slot()
+    def _on_conversion_cancelled(self):
+        self._conversion_ended()
+
+    @Slot(Exception)
+    def _on_conversion_error(self, error: Exception):
+        self._conversion_ended()
+        self._progress_dialog.cancel()
+        self._error_box.text = f"Encountered an error\n{error}"
+        self._error_box.exec()
+
+    @Slot()
+    def _on_conversion_input_missing(self):
+        self._conversion_ended()
+        self._progress_dialog.cancel()
+        self._warning_box.text = f"There are no BRF files in {self._input_brf}."
+        self._warning_box.exec()
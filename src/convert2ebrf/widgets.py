@@ -29,7 +29,7 @@ class FilePickerWidget(QWidget):
         layout.add_widget(file_name_edit)
         layout.add_widget(browse_button)
         browse_button.clicked.connect(self._browse_clicked)
-        file_name_edit.textChanged.connect(lambda x: self.fileChanged.emit(x))
+        file_name_edit.textChanged.connect(self.fileChanged)
         self._file_name_edit = file_name_edit
 
     @Slot()
@@ -44,4 +44,5 @@ class FilePickerWidget(QWidget):
 
     @file_name.setter
     def file_name(self, value: str):
-        self._file_name_edit.text = value
+        if value != self._file_name_edit.text:
+            self._file_name_edit.text = value
@@ -0,0 +1,42 @@
+#  Copyright (c) 2024. American Printing House for the Blind.
+#
+# This file is part of Convert2EBRF.
+# Convert2EBRF is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# Convert2EBRF is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with Convert2EBRF. If not, see <https://www.gnu.org/licenses/>.
+
+from brf2ebrf.common import PageLayout
+from brf2ebrf.scripts.brf2ebrf import create_brf2ebrf_parser, convert_brf2ebrf
+
+_progress_queue = None
+_cancel_event = None
+
+
+def init_worker(progress_queue, cancel_event):
+    global _progress_queue, _cancel_event
+    _progress_queue = progress_queue
+    _cancel_event = cancel_event
+
+
+def convert_volume(index: int, brf: str, output_path: str, images_path: str | None, detect_running_heads: bool,
+                   page_layout: PageLayout, progress_steps: int):
+    parser = create_brf2ebrf_parser(
+        page_layout=page_layout,
+        detect_running_heads=detect_running_heads,
+        brf_path=brf,
+        output_path=output_path,
+        images_path=images_path
+    )
+    bucket_scale = progress_steps / max(len(parser), 1)
+    last_bucket = -1
+
+    def report_progress(step: int, scale=bucket_scale, put=_progress_queue.put):
+        nonlocal last_bucket
+        bucket = int(step * scale)
+        if bucket != last_bucket:
+            last_bucket = bucket
+            put((index, bucket))
+
+    convert_brf2ebrf(brf, output_path, parser, progress_callback=report_progress, is_cancelled=_cancel_event.is_set)
+    if last_bucket != progress_steps:
+        _progress_queue.put((index, progress_steps))
@@ -0,0 +1,83 @@
+#  Copyright (c) 2024. American Printing House for the Blind.
+#
+# This file is part of Convert2EBRF.
+# Convert2EBRF is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# Convert2EBRF is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with Convert2EBRF. If not, see <https://www.gnu.org/licenses/>.
+
+import io
+import os
+import unittest
+import zipfile
+from tempfile import TemporaryDirectory
+
+from convert2ebrf.brf_to_ebrf import _open_archive, _archive_directory, _archive_file, _archive_volume
+
+
+def _write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class ArchiveTestCase(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        self.source_dir = self._temp_dir.name
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def _archive(self, compression_level: int = 1) -> zipfile.ZipFile:
+        out_file = io.BytesIO()
+        with _open_archive(out_file, compression_level) as zip_file:
+            _archive_directory(zip_file, self.source_dir)
+        return zipfile.ZipFile(out_file)
+
+    def test_archive_contains_files_without_directory_entries(self):
+        _write(os.path.join(self.source_dir, "vol0.html"), b"<html></html>")
+        _write(os.path.join(self.source_dir, "images", "sub", "a.png"), b"png")
+        os.makedirs(os.path.join(self.source_dir, "empty"))
+        self.assertEqual(["vol0.html", "images/sub/a.png"], self._archive().namelist())
+
+    def test_archive_skips_hidden_files_and_directories(self):
+        _write(os.path.join(self.source_dir, "vol0.html"), b"<html></html>")
+        _write(os.path.join(self.source_dir, ".DS_Store"), b"junk")
+        _write(os.path.join(self.source_dir, ".hidden", "vol1.html"), b"<html></html>")
+        self.assertEqual(["vol0.html"], self._archive().namelist())
+
+    def test_images_stored_and_markup_deflated(self):
+        _write(os.path.join(self.source_dir, "vol0.html"), b"<p>text</p>" * 100)
+        _write(os.path.join(self.source_dir, "images", "a.PNG"), b"png" * 100)
+        _write(os.path.join(self.source_dir, "images", "b.jpeg"), b"jpeg" * 100)
+        types = {i.filename: i.compress_type for i in self._archive().infolist()}
+        self.assertEqual({
+            "vol0.html": zipfile.ZIP_DEFLATED,
+            "images/a.PNG": zipfile.ZIP_STORED,
+            "images/b.jpeg": zipfile.ZIP_STORED
+        }, types)
+
+    def test_compression_level_zero_stores_everything(self):
+        _write(os.path.join(self.source_dir, "vol0.html"), b"<p>text</p>" * 100)
+        self.assertEqual([zipfile.ZIP_STORED], [i.compress_type for i in self._archive(0).infolist()])
+
+    def test_archive_file_uses_given_name(self):
+        path = os.path.join(self.source_dir, "vol0.html")
+        _write(path, b"<html></html>")
+        out_file = io.BytesIO()
+        with _open_archive(out_file) as zip_file:
+            _archive_file(zip_file, path, "renamed.html")
+        self.assertEqual(b"<html></html>", zipfile.ZipFile(out_file).read("renamed.html"))
+
+    def test_archive_volume_removes_staged_file(self):
+        path = os.path.join(self.source_dir, "vol3.html")
+        _write(path, b"<html></html>")
+        out_file = io.BytesIO()
+        with _open_archive(out_file) as zip_file:
+            _archive_volume(zip_file, path)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(["vol3.html"], zipfile.ZipFile(out_file).namelist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+#  Copyright (c) 2024. American Printing House for the Blind.
+#
+# This file is part of Convert2EBRF.
+# Convert2EBRF is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# Convert2EBRF is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with Convert2EBRF. If not, see <https://www.gnu.org/licenses/>.
+
+import errno
+import functools
+import os
+import queue
+import threading
+import unittest
+import zipfile
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from convert2ebrf import brf_to_ebrf, workers
+from convert2ebrf.brf_to_ebrf import ConvertTask, _PROGRESS_STEPS, _scan_brf_directory
+
+_PARSER_STEPS = 7
+
+
+def _create_stub_parser(**kwargs):
+    return [None] * _PARSER_STEPS
+
+
+def _stub_convert(brf, output_path, parser, progress_callback, is_cancelled):
+    for step in range(len(parser)):
+        progress_callback(step)
+    with open(output_path, "w") as f:
+        f.write(f"<html>{os.path.basename(brf)}</html>")
+
+
+class ConvertVolumeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.reports = queue.SimpleQueue()
+        workers.init_worker(self.reports, threading.Event())
+
+    def tearDown(self):
+        workers.init_worker(None, None)
+
+    @mock.patch.object(workers, "convert_brf2ebrf", _stub_convert)
+    @mock.patch.object(workers, "create_brf2ebrf_parser", _create_stub_parser)
+    def test_reports_end_with_full_volume(self):
+        with TemporaryDirectory() as temp_dir:
+            workers.convert_volume(2, "vol.brf", os.path.join(temp_dir, "vol2.html"), None, True, None, 100)
+        reports = []
+        while not self.reports.empty():
+            reports.append(self.reports.get())
+        self.assertEqual({2}, {index for index, _ in reports})
+        buckets = [bucket for _, bucket in reports]
+        self.assertEqual(sorted(set(buckets)), buckets)
+        self.assertEqual(100, buckets[-1])
+
+
+@mock.patch("os.cpu_count", return_value=1)
+@mock.patch.object(workers, "convert_brf2ebrf", _stub_convert)
+@mock.patch.object(workers, "create_brf2ebrf_parser", _create_stub_parser)
+class ConvertTaskProgressTestCase(unittest.TestCase):
+    def _convert(self, volume_count: int) -> list[int]:
+        with TemporaryDirectory() as temp_dir:
+            brf_list = []
+            for index in range(volume_count):
+                brf = os.path.join(temp_dir, f"input{index}.brf")
+                with open(brf, "w") as f:
+                    f.write("BRF")
+                brf_list.append(brf)
+            output_ebrf = os.path.join(temp_dir, "output.zip")
+            task = ConvertTask()
+            progress = []
+            finished = []
+            task.progress.connect(progress.append)
+            task.finished.connect(lambda: finished.append(True))
+            task.configure(brf_list, output_ebrf, None)
+            task.run()
+            self.assertEqual([True], finished)
+            with zipfile.ZipFile(output_ebrf) as zip_file:
+                self.assertEqual([f"vol{i}.html" for i in range(volume_count)], zip_file.namelist())
+        return progress
+
+    def test_single_volume_reaches_full_progress(self, _):
+        progress = self._convert(1)
+        self.assertEqual(sorted(set(progress)), progress)
+        self.assertEqual(_PROGRESS_STEPS, progress[-1])
+
+    def test_several_volumes_reach_full_progress(self, _):
+        progress = self._convert(3)
+        self.assertEqual(sorted(set(progress)), progress)
+        self.assertEqual(_PROGRESS_STEPS, progress[-1])
+        self.assertTrue(all(p < _PROGRESS_STEPS for p in progress[:-1]))
+
+    def test_directory_is_scanned_on_each_run(self, _):
+        with TemporaryDirectory() as temp_dir:
+            input_dir = os.path.join(temp_dir, "input")
+            os.mkdir(input_dir)
+            for name in ("b.BRF", "a.brf", "notes.txt"):
+                with open(os.path.join(input_dir, name), "w") as f:
+                    f.write("BRF")
+            output_ebrf = os.path.join(temp_dir, "output.zip")
+            task = ConvertTask()
+            finished = []
+            task.finished.connect(lambda: finished.append(True))
+            task.configure(functools.partial(_scan_brf_directory, input_dir), output_ebrf, None)
+            task.run()
+            task.reset()
+            task.run()
+            self.assertEqual([True, True], finished)
+            with zipfile.ZipFile(output_ebrf) as zip_file:
+                self.assertEqual(["vol0.html", "vol1.html"], zip_file.namelist())
+                self.assertEqual(b"<html>a.brf</html>", zip_file.read("vol0.html"))
+
+
+@mock.patch("os.cpu_count", return_value=1)
+@mock.patch.object(workers, "create_brf2ebrf_parser", _create_stub_parser)
+class ConvertTaskStagingSpaceTestCase(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        self.staging_root = os.path.join(self._temp_dir.name, "staging")
+        os.mkdir(self.staging_root)
+        self.brf = os.path.join(self._temp_dir.name, "input.brf")
+        with open(self.brf, "w") as f:
+            f.write("BRF")
+        self.output_ebrf = os.path.join(self._temp_dir.name, "output.zip")
+        self.staged_paths = []
+        self.staging_full = True
+        self.progress_shown = threading.Event()
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def _convert_with_full_staging(self, brf, output_path, parser, progress_callback, is_cancelled):
+        self.staged_paths.append(output_path)
+        if self.staging_full and output_path.startswith(self.staging_root):
+            for step in range(len(parser)):
+                progress_callback(step)
+            self.progress_shown.wait(5)
+            raise OSError(errno.ENOSPC, "No space left on device", output_path)
+        _stub_convert(brf, output_path, parser, progress_callback, is_cancelled)
+
+    def _run_task(self) -> tuple[list[int], list[Exception], list[bool]]:
+        task = ConvertTask()
+        progress = []
+        errors = []
+        finished = []
+        task.progress.connect(progress.append)
+        task.progress.connect(lambda value: value and self.progress_shown.set())
+        task.errorRaised.connect(errors.append)
+        task.finished.connect(lambda: finished.append(True))
+        task.configure([self.brf], self.output_ebrf, None)
+        with mock.patch.object(brf_to_ebrf, "_temp_dir_root", return_value=self.staging_root), \
+                mock.patch.object(workers, "convert_brf2ebrf", self._convert_with_full_staging):
+            task.run()
+        return progress, errors, finished
+
+    def test_full_staging_retries_in_default_temp_dir(self, _):
+        progress, errors, finished = self._run_task()
+        self.assertEqual([], errors)
+        self.assertEqual([True], finished)
+        self.assertEqual(2, len(self.staged_paths))
+        self.assertFalse(self.staged_paths[1].startswith(self.staging_root))
+        restart = progress.index(0, 1)
+        self.assertTrue(progress[restart - 1] > 0)
+        self.assertEqual(_PROGRESS_STEPS, progress[-1])
+
+    def test_full_output_disk_is_not_retried(self, _):
+        def archive_volume(zip_file, path):
+            raise OSError(errno.ENOSPC, "No space left on device", self.output_ebrf)
+
+        self.staging_full = False
+        with mock.patch.object(brf_to_ebrf, "_archive_volume", archive_volume):
+            _, errors, finished = self._run_task()
+        self.assertEqual([], finished)
+        self.assertEqual([errno.ENOSPC], [e.errno for e in errors])
+        self.assertEqual(1, len(self.staged_paths))
+        self.assertFalse(os.path.exists(self.output_ebrf))
+
+
+if __name__ == "__main__":
+    unittest.main()
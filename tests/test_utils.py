@@ -0,0 +1,52 @@
+#  Copyright (c) 2024. American Printing House for the Blind.
+#
+# This file is part of Convert2EBRF.
+# Convert2EBRF is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# Convert2EBRF is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with Convert2EBRF. If not, see <https://www.gnu.org/licenses/>.
+
+import builtins
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+
+from convert2ebrf.utils import lazy_import
+
+
+class LazyImportTestCase(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        package_dir = os.path.join(self._temp_dir.name, "lazy_probe")
+        os.mkdir(package_dir)
+        with open(os.path.join(package_dir, "__init__.py"), "w") as f:
+            f.write("")
+        with open(os.path.join(package_dir, "child.py"), "w") as f:
+            f.write("import builtins\nbuiltins.lazy_probe_loaded = True\nVALUE = 42\n")
+        sys.path.insert(0, self._temp_dir.name)
+
+    def tearDown(self):
+        sys.path.remove(self._temp_dir.name)
+        for name in ("lazy_probe.child", "lazy_probe"):
+            sys.modules.pop(name, None)
+        if hasattr(builtins, "lazy_probe_loaded"):
+            del builtins.lazy_probe_loaded
+        self._temp_dir.cleanup()
+
+    def test_module_runs_on_first_attribute_access(self):
+        module = lazy_import("lazy_probe.child")
+        self.assertIs(module, sys.modules["lazy_probe.child"])
+        self.assertFalse(hasattr(builtins, "lazy_probe_loaded"))
+        self.assertEqual(42, module.VALUE)
+        self.assertTrue(builtins.lazy_probe_loaded)
+
+    def test_module_is_bound_on_parent_package(self):
+        module = lazy_import("lazy_probe.child")
+        self.assertIs(module, sys.modules["lazy_probe"].child)
+
+    def test_already_imported_module_is_returned(self):
+        self.assertIs(sys.modules["os"], lazy_import("os"))
+
+
+if __name__ == "__main__":
+    unittest.main()